@@ -9,17 +9,43 @@ Deploy on Replit: just click Run!
 
 import streamlit as st
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import json
 import xml.etree.ElementTree as ET
 import time
+import threading
 import io
 import os
+import re
+import random
+import zlib
+import functools
+import hashlib
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 
+try:
+    from lxml import etree as LET
+except ImportError:
+    LET = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import diskcache
+except ImportError:
+    diskcache = None
+
 try:
     import openpyxl
-    from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
+    from openpyxl.styles import Font, PatternFill, Alignment, Border, Side, NamedStyle
     from openpyxl.utils import get_column_letter
+    from openpyxl.cell import WriteOnlyCell
 except ImportError:
     st.error("openpyxl not installed. Add it to requirements.txt")
     st.stop()
@@ -29,11 +55,124 @@ BASE_URL = "https://projects.propublica.org/nonprofits/api/v2"
 SEARCH_URL = f"{BASE_URL}/search.json"
 ORG_URL = f"{BASE_URL}/organizations"
 XML_URL = "https://projects.propublica.org/nonprofits/download-xml"
-REQUEST_DELAY = 0.5
 
 # Apollo.io API
 APOLLO_API_URL = "https://api.apollo.io/api/v1"
 
+
+@st.cache_resource
+def get_http_session():
+    """
+    One keep-alive, connection-pooled session per server process. Cached as a
+    resource so script reruns and concurrent user sessions all share it.
+    XML downloads redirect off projects.propublica.org to the e-file storage
+    hosts, so keep enough per-host pools that those never evict the API's.
+    Connection failures and transient 5xx on GETs are retried here with short
+    backoff; read timeouts and 429s are left to the callers' loops, which go
+    through the token buckets and cap Retry-After.
+    """
+    session = requests.Session()
+    retry = Retry(total=3, read=0, backoff_factor=0.5, status_forcelist=(500, 502, 503, 504),
+                  respect_retry_after_header=False, raise_on_status=False)
+    adapter = HTTPAdapter(pool_connections=8, pool_maxsize=32, max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update({"User-Agent": "CharityProspector/1.0",
+                            "Accept-Encoding": "gzip, deflate"})
+    return session
+
+
+class TokenBucket:
+    """
+    Thread-safe rate limiter that hands out evenly spaced request slots.
+    After a 429, slow_down() halves the rate for a cool-off period and can hold
+    every caller back until the server's retry window has passed.
+    """
+
+    def __init__(self, rps, min_rps=0.25, cooloff=60):
+        self.base_rps = rps
+        self.rps = rps
+        self.min_rps = min_rps
+        self.cooloff = cooloff
+        self._next_slot = 0.0
+        self._restore_at = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        with self._lock:
+            now = time.monotonic()
+            if self.rps < self.base_rps and now >= self._restore_at:
+                self.rps = self.base_rps
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + 1 / self.rps
+        time.sleep(max(0, slot - now))
+
+    def slow_down(self, pause=0):
+        with self._lock:
+            now = time.monotonic()
+            self.rps = max(self.min_rps, self.rps / 2)
+            self._restore_at = now + self.cooloff
+            self._next_slot = max(self._next_slot, now + pause)
+
+
+# Longest pause a 429 may put on a shared bucket; every thread waits it out
+MAX_RETRY_AFTER = 60
+
+
+def retry_delay(resp, attempt, base):
+    """
+    Seconds to back off after a 429: Retry-After if sent, else jittered exponential.
+    None if the server asks for more than MAX_RETRY_AFTER, in which case the caller
+    gives up on the request instead of stalling the bucket.
+    """
+    try:
+        delay = float(resp.headers.get("Retry-After"))
+    except (TypeError, ValueError):
+        return min(base * 2 ** attempt * random.uniform(0.5, 1.5), MAX_RETRY_AFTER)
+    return delay if delay <= MAX_RETRY_AFTER else None
+
+
+# Like the session, buckets are per server process: a module-level instance
+# would be rebuilt on every rerun and give each user session its own ceiling
+@st.cache_resource
+def get_propublica_bucket():
+    return TokenBucket(rps=2.0)
+
+
+@st.cache_resource
+def get_apollo_bucket():
+    return TokenBucket(rps=3.0)
+
+
+# Cache lifetimes (memory and disk). Search listings are the only data that
+# churns; org filings change a few times a year and a filed 990 XML never does.
+SEARCH_TTL = 6 * 3600
+ORG_TTL = 7 * 24 * 3600
+XML_TTL = 30 * 24 * 3600
+
+# Window size for streaming XML through zlib and the parser
+XML_CHUNK_SIZE = 64 * 1024
+
+# On-disk L2 cache under @st.cache_data so downloads survive server restarts.
+DISK_CACHE_DIR = "./.cache_xml"
+
+
+@st.cache_resource
+def get_disk_cache():
+    """One diskcache handle (and SQLite connection pool) per server process, or None."""
+    return diskcache.Cache(DISK_CACHE_DIR, size_limit=2 * 1024 ** 3) if diskcache else None
+
+
+# C-accelerated JSON when orjson is installed
+json_loads = orjson.loads if orjson else json.loads
+
+
+def json_dumps(data):
+    """Serialize to compact UTF-8 JSON bytes."""
+    if orjson:
+        return orjson.dumps(data)
+    return json.dumps(data, separators=(',', ':'), ensure_ascii=False).encode()
+
 BROAD_SEARCH_KEYWORDS = [
     "foundation", "hospital", "university", "association", "society",
     "institute", "museum", "community", "health", "education",
@@ -43,61 +182,147 @@ BROAD_SEARCH_KEYWORDS = [
     "development", "advocacy", "prevention", "counseling", "food bank",
 ]
 
+# Move on to the next keyword once its pages are mostly EINs we've already seen
+NOVELTY_MIN_FETCHED = 50
+NOVELTY_MIN_RATIO = 0.2
+
 
 # ─── API Helpers ─────────────────────────────────────────────────────────────
-@st.cache_data(ttl=3600, show_spinner=False)
-def api_get(url, params_tuple=None):
+class FetchError(Exception):
+    """
+    A lookup that didn't succeed. Raised inside @st.cache_data functions so
+    failures are never memoized; the uncached wrappers turn it into None.
+    """
+
+
+def api_get(url, params_tuple=None, ttl=ORG_TTL):
+    disk_key = ("api", url, params_tuple)
+    disk = get_disk_cache()
+    bucket = get_propublica_bucket()
+    if disk is not None:
+        cached = disk.get(disk_key)
+        if cached is not None:
+            return cached
+
     params = dict(params_tuple) if params_tuple else None
+    error = None
     for attempt in range(3):
         try:
-            time.sleep(REQUEST_DELAY)
-            resp = requests.get(url, params=params, timeout=30,
-                                headers={"User-Agent": "CharityProspector/1.0"})
+            bucket.acquire()
+            resp = get_http_session().get(url, params=params, timeout=30)
             if resp.status_code == 200:
-                return resp.json()
-            elif resp.status_code == 429:
-                time.sleep(10 * (attempt + 1))
-            else:
-                return None
-        except Exception:
+                data = json_loads(resp.content)
+                if disk is not None:
+                    disk.set(disk_key, data, expire=ttl)
+                return data
+            error = f"HTTP {resp.status_code}"
+            if resp.status_code != 429:
+                break
+            pause = retry_delay(resp, attempt, 10)
+            bucket.slow_down(pause=pause or 0)
+            if pause is None:
+                break
+        except Exception as exc:
+            error = exc
             time.sleep(5)
-    return None
+    raise FetchError(f"{url}: {error}")
 
 
-@st.cache_data(ttl=3600, show_spinner=False)
-def fetch_xml(url):
+def fetch_xml_compressed(url):
+    """zlib-compressed Form 990 XML e-file, or None if it couldn't be downloaded."""
+    try:
+        return _fetch_xml_compressed_cached(url)
+    except FetchError:
+        return None
+
+
+# 990 XML is highly repetitive text and compresses ~10x, so cache entries
+# (memory and disk) hold zlib-compressed bytes
+@st.cache_data(ttl=XML_TTL, max_entries=2000, show_spinner=False)
+def _fetch_xml_compressed_cached(url):
+    disk_key = ("xml.z", url)
+    disk = get_disk_cache()
+    bucket = get_propublica_bucket()
+    if disk is not None:
+        cached = disk.get(disk_key)
+        if cached:
+            return cached
+
+    error = None
     for attempt in range(4):
         try:
-            time.sleep(max(REQUEST_DELAY, 1.5))
-            resp = requests.get(url, timeout=30,
-                                headers={"User-Agent": "CharityProspector/1.0"})
-            if resp.status_code == 200:
-                content = resp.content
-                if content.startswith(b'\xef\xbb\xbf'):
-                    content = content[3:]
-                if content.lstrip().startswith(b'Error 429') or content.lstrip().startswith(b'<html'):
-                    time.sleep(15 * (attempt + 1))
-                    continue
-                return content
-            elif resp.status_code == 429:
-                time.sleep(15 * (attempt + 1))
-            else:
-                return None
-        except Exception:
+            bucket.acquire()
+            with get_http_session().get(url, timeout=30, stream=True) as resp:
+                if resp.status_code == 200:
+                    chunks = resp.iter_content(XML_CHUNK_SIZE)
+                    first = next(chunks, b"")
+                    if not first:
+                        # An empty body still compresses to a non-empty blob; don't cache it as a filing
+                        error = "empty body"
+                        break
+                    # Sniff only the head for error pages; the XML parsers accept a leading BOM as-is
+                    head = first[:200].lstrip(b'\xef\xbb\xbf \t\r\n')
+                    if head.startswith(b'Error 429') or head.startswith(b'<html'):
+                        error = "rate-limit page"
+                        pause = retry_delay(resp, attempt, 15)
+                        bucket.slow_down(pause=pause or 0)
+                        if pause is None:
+                            break
+                        continue
+                    # Compress as the body arrives so the raw XML is never held whole
+                    z = zlib.compressobj()
+                    parts = [z.compress(first)]
+                    parts.extend(z.compress(chunk) for chunk in chunks)
+                    parts.append(z.flush())
+                    blob = b"".join(parts)
+                    if disk is not None:
+                        disk.set(disk_key, blob, expire=XML_TTL)
+                    return blob
+                error = f"HTTP {resp.status_code}"
+                if resp.status_code != 429:
+                    break
+                pause = retry_delay(resp, attempt, 15)
+                bucket.slow_down(pause=pause or 0)
+                if pause is None:
+                    break
+        except Exception as exc:
+            error = exc
             time.sleep(5)
-    return None
+    raise FetchError(f"{url}: {error}")
 
 
 def search_orgs(query="", state=None, page=0):
+    # Canonicalize so equivalent searches share one cache entry
+    try:
+        return _search_orgs_cached((query or "").strip().lower(), (state or "").strip().upper(), int(page))
+    except FetchError:
+        return None
+
+
+@st.cache_data(ttl=SEARCH_TTL, show_spinner=False)
+def _search_orgs_cached(query, state, page):
     params = {"q": query, "page": str(page)}
     if state:
         params["state"] = state
-    return api_get(SEARCH_URL, params_tuple=tuple(sorted(params.items())))
+    return api_get(SEARCH_URL, params_tuple=tuple(sorted(params.items())), ttl=SEARCH_TTL)
 
 
 def get_org_details(ein):
+    try:
+        return _get_org_details_cached(str(ein))
+    except FetchError:
+        return None
+
+
+@st.cache_data(ttl=ORG_TTL, show_spinner=False)
+def _get_org_details_cached(ein):
     url = f"{ORG_URL}/{ein}.json"
-    return api_get(url)
+    data = api_get(url, ttl=ORG_TTL)
+    if not data:
+        return data
+    # Only the latest filing is used; keep the memoized entry small
+    return {"organization": data.get("organization", {}),
+            "filings_with_data": (data.get("filings_with_data") or [])[:1]}
 
 
 def get_xml_url(org_data):
@@ -124,36 +349,23 @@ def check_revenue(org_data, min_rev, max_rev):
     return False, revenue, total_expenses
 
 
-# ─── Fundraising Expense from XML ───────────────────────────────────────────
-def get_fundraising_expense_from_xml(xml_content):
-    if not xml_content:
-        return 0
-    try:
-        root = ET.fromstring(xml_content)
-        for elem in root.iter():
-            tag = elem.tag.split('}')[-1] if '}' in elem.tag else elem.tag
-            if tag in ('CYTotalFundraisingExpenseAmt', 'TotalFundrsngExpCurrentYrAmt'):
-                if elem.text:
-                    try:
-                        return float(elem.text)
-                    except ValueError:
-                        pass
-        for elem in root.iter():
-            tag = elem.tag.split('}')[-1] if '}' in elem.tag else elem.tag
-            if tag == 'FundraisingAmt':
-                parent = None
-                for p in root.iter():
-                    if elem in list(p):
-                        ptag = p.tag.split('}')[-1] if '}' in p.tag else p.tag
-                        if 'Total' in ptag:
-                            if elem.text:
-                                try:
-                                    return float(elem.text)
-                                except ValueError:
-                                    pass
-    except Exception:
-        pass
-    return 0
+# Filing-extract fields carrying total fundraising expense (varies by form version)
+JSON_FUNDRAISING_FIELDS = ("totfuncfndrsng", "fndraisexpns")
+
+
+def get_json_fundraising(org_data):
+    """Fundraising expense reported in the JSON filing, or None if absent/zero."""
+    filings = (org_data or {}).get("filings_with_data") or []
+    if not filings:
+        return None
+    for field in JSON_FUNDRAISING_FIELDS:
+        value = filings[0].get(field)
+        if value:
+            try:
+                return float(value)
+            except (TypeError, ValueError):
+                pass
+    return None
 
 
 def build_org_details(org_data, revenue, total_expenses, fundraising_exp, xml_url):
@@ -179,194 +391,292 @@ def build_org_details(org_data, revenue, total_expenses, fundraising_exp, xml_ur
     }
 
 
-# ─── Schedule G Parser ───────────────────────────────────────────────────────
-def parse_schedule_g_from_content(xml_content):
-    if not xml_content:
-        return []
+# ─── Form 990 XML Parser ─────────────────────────────────────────────────────
+FUNDRAISING_TOTAL_TAGS = {'CYTotalFundraisingExpenseAmt', 'TotalFundrsngExpCurrentYrAmt'}
+AGENCY_ENTRY_TAGS = {'FundraiserActivityInfoGrp', 'ProfessionalFundraising',
+                     'FundraisingActivityGroup', 'ProfFundRaisingGrp'}
+OFFICER_ENTRY_TAGS = {'Form990PartVIISectionAGrp', 'OfficerDirectorTrusteeEmplGrp',
+                      'CompensationInfoGrp', 'Form990PartVIISectionA'}
+
+
+# Candidate tags per output field, in priority order (schema versions differ)
+AGENCY_FIELDS = {
+    'name': ('PersonNm', 'BusinessNameLine1Txt', 'BusinessNameLine1',
+             'BusinessName', 'OrganizationBusinessName'),
+    'amount_paid': ('RetainedByContractorAmt', 'AmtPaidToFundraiser',
+                    'CompensationAmount', 'AmountPaidToFundraiser', 'CompensationAmt'),
+    'amount_raised': ('GrossReceiptsFromActivityAmt', 'AmountRaisedByContractor',
+                      'GrossReceiptsFromActivity'),
+    'activity': ('ActivityTxt', 'Activity', 'Description'),
+    'city': ('CityNm', 'City'),
+    'state': ('StateAbbreviationCd', 'State'),
+}
+OFFICER_FIELDS = {
+    'name': ('PersonNm', 'PersonFullName', 'Name',
+             'BusinessNameLine1Txt', 'BusinessNameLine1'),
+    'title': ('TitleTxt', 'Title', 'PersonTitleTxt'),
+    'compensation': ('ReportableCompFromOrgAmt', 'ReportableCompFromOrg',
+                     'CompensationAmount', 'TotalCompensation'),
+    'hours_per_week': ('AverageHoursPerWeekRt', 'AverageHoursPerWeek',
+                       'AvgHoursPerWkDevotedToPosRt'),
+}
+_CONVERTERS = {'amount_paid': float, 'amount_raised': float, 'compensation': float}
+
+
+def _field_map(fields):
+    """Invert {field: tags in priority order} into {tag: (field, rank)}."""
+    return {tag: (field, rank) for field, tags in fields.items() for rank, tag in enumerate(tags)}
+
+
+AGENCY_FIELD_MAP = _field_map(AGENCY_FIELDS)
+OFFICER_FIELD_MAP = _field_map(OFFICER_FIELDS)
+
+
+def _extract_fields(entry, fields, field_map):
+    """
+    Pull fields out of an entry's descendants in one pass. For each field the
+    highest-priority tag wins, using its first occurrence that has text.
+    """
+    found = {}
+    ranks = {}
+    tried = set()
+    for child in entry.iter():
+        tag = child.tag.rpartition('}')[2]
+        spec = field_map.get(tag)
+        if spec is None or not child.text or tag in tried:
+            continue
+        tried.add(tag)
+        field, rank = spec
+        if rank >= ranks.get(field, len(fields[field])):
+            continue
+        try:
+            found[field] = _CONVERTERS.get(field, str.strip)(child.text)
+            ranks[field] = rank
+        except ValueError:
+            pass
+    return {f: found[f] for f in fields if f in found}
+
+
+XML_WHITELIST = (FUNDRAISING_TOTAL_TAGS | {'FundraisingAmt'}
+                 | AGENCY_ENTRY_TAGS | OFFICER_ENTRY_TAGS)
+XML_WHITELIST_ANY_NS = ['{*}' + t for t in sorted(XML_WHITELIST)]
+
+
+def _dispatch_990(elem, tag, parent, acc):
+    """Fold one whitelisted element into acc; return True once it can be discarded."""
+    if tag in FUNDRAISING_TOTAL_TAGS:
+        if acc["total"] is None and elem.text:
+            try:
+                acc["total"] = float(elem.text)
+            except ValueError:
+                pass
+    elif tag == 'FundraisingAmt':
+        # Older schemas: functional-expense fundraising column of the Total row
+        if acc["fallback"] is None and elem.text and parent is not None \
+                and 'Total' in parent.tag.rpartition('}')[2]:
+            try:
+                acc["fallback"] = float(elem.text)
+            except ValueError:
+                pass
+    elif tag in AGENCY_ENTRY_TAGS:
+        agency = _extract_fields(elem, AGENCY_FIELDS, AGENCY_FIELD_MAP)
+        if agency.get('name'):
+            acc["agencies"].append(agency)
+        return True
+    elif tag in OFFICER_ENTRY_TAGS:
+        person = _extract_fields(elem, OFFICER_FIELDS, OFFICER_FIELD_MAP)
+        if person.get('name'):
+            acc["officers"].append(person)
+        return True
+    return False
+
+
+def _iter_decompressed(blob):
+    """Inflate a zlib blob window by window instead of materializing the whole XML."""
+    d = zlib.decompressobj()
+    view = memoryview(blob)
+    for i in range(0, len(view), XML_CHUNK_SIZE):
+        yield d.decompress(view[i:i + XML_CHUNK_SIZE])
+    yield d.flush()
+
+
+def _drain_990_events(parser, acc):
+    for _, elem in parser.read_events():
+        if _dispatch_990(elem, elem.tag.rpartition('}')[2], elem.getparent(), acc):
+            # Drop the processed entry and everything before it to keep memory flat
+            elem.clear()
+            while elem.getprevious() is not None:
+                del elem.getparent()[0]
+
+
+def _walk_990_lxml(chunks, acc):
+    # {*} matches any namespace, so libxml2 filters by local name and the
+    # IRS's per-version namespace URIs never need to be known up front
+    parser = LET.XMLPullParser(events=('end',), tag=XML_WHITELIST_ANY_NS, resolve_entities=False)
+    for chunk in chunks:
+        parser.feed(chunk)
+        _drain_990_events(parser, acc)
+    parser.close()
+    _drain_990_events(parser, acc)
+
+
+def _walk_990_etree(chunks, acc):
+    root = ET.fromstring(b"".join(chunks))
+    # Walk (parent, child) pairs so the parent is known without a lookup table
+    for parent in root.iter():
+        for elem in parent:
+            tag = elem.tag.rpartition('}')[2]
+            if tag in XML_WHITELIST:
+                _dispatch_990(elem, tag, parent, acc)
+
+
+def parse_990_compressed(blob):
+    """
+    Parse a fetch_xml_compressed Form 990 e-file in a single pass, inflating it
+    straight into the parser (lxml pull parser when available).
+    Returns {"fundraising": float, "agencies": [...], "officers": [...]}, where
+    agencies come from Schedule G and officers from Part VII Section A.
+    """
+    return _parse_990_chunks(_iter_decompressed(blob) if blob else None)
+
+
+def _parse_990_chunks(chunks):
+    if chunks is None:
+        return {"fundraising": 0, "agencies": [], "officers": []}
+    acc = {"total": None, "fallback": None, "agencies": [], "officers": []}
     try:
-        root = ET.fromstring(xml_content)
-        agencies = []
-
-        # Find fundraiser activity entries (multiple schema versions)
-        found_entries = []
-        for elem in root.iter():
-            tag = elem.tag.split('}')[-1] if '}' in elem.tag else elem.tag
-            if tag in ('FundraiserActivityInfoGrp', 'ProfessionalFundraising',
-                       'FundraisingActivityGroup', 'ProfFundRaisingGrp'):
-                found_entries.append(elem)
-
-        for entry in found_entries:
-            agency = {}
-
-            # Agency name
-            for name_tag in ('PersonNm', 'BusinessNameLine1Txt', 'BusinessNameLine1',
-                             'BusinessName', 'OrganizationBusinessName'):
-                for child in entry.iter():
-                    ctag = child.tag.split('}')[-1] if '}' in child.tag else child.tag
-                    if ctag == name_tag and child.text:
-                        agency['name'] = child.text.strip()
-                        break
-                if 'name' in agency:
-                    break
+        if LET is not None:
+            _walk_990_lxml(chunks, acc)
+        else:
+            _walk_990_etree(chunks, acc)
+    except Exception:
+        return {"fundraising": 0, "agencies": [], "officers": []}
 
-            if 'name' not in agency:
-                for child in entry.iter():
-                    ctag = child.tag.split('}')[-1] if '}' in child.tag else child.tag
-                    if ctag == 'BusinessNameLine1Txt' and child.text:
-                        agency['name'] = child.text.strip()
-                        break
+    fundraising = acc["total"] if acc["total"] is not None else acc["fallback"]
+    return {"fundraising": fundraising if fundraising is not None else 0, "agencies": acc["agencies"],
+            "officers": acc["officers"]}
 
-            # Amount paid
-            for amt_tag in ('RetainedByContractorAmt', 'AmtPaidToFundraiser',
-                            'CompensationAmount', 'AmountPaidToFundraiser', 'CompensationAmt'):
-                for child in entry.iter():
-                    ctag = child.tag.split('}')[-1] if '}' in child.tag else child.tag
-                    if ctag == amt_tag and child.text:
-                        try:
-                            agency['amount_paid'] = float(child.text)
-                        except ValueError:
-                            pass
-                        break
-                if 'amount_paid' in agency:
-                    break
 
-            # Amount raised
-            for raised_tag in ('GrossReceiptsFromActivityAmt', 'AmountRaisedByContractor',
-                               'GrossReceiptsFromActivity'):
-                for child in entry.iter():
-                    ctag = child.tag.split('}')[-1] if '}' in child.tag else child.tag
-                    if ctag == raised_tag and child.text:
-                        try:
-                            agency['amount_raised'] = float(child.text)
-                        except ValueError:
-                            pass
-                        break
-                if 'amount_raised' in agency:
-                    break
+# ─── Org Evaluation ──────────────────────────────────────────────────────────
+SEARCH_WORKERS = 8
+# Per-agency detail lines in the Phase 1 log; off keeps only the pass/fail verdicts
+LOG_VERBOSE = True
 
-            # Activity
-            for desc_tag in ('ActivityTxt', 'Activity', 'Description'):
-                for child in entry.iter():
-                    ctag = child.tag.split('}')[-1] if '}' in child.tag else child.tag
-                    if ctag == desc_tag and child.text:
-                        agency['activity'] = child.text.strip()
-                        break
-                if 'activity' in agency:
-                    break
 
-            # Address
-            for addr_tag in ('CityNm', 'City'):
-                for child in entry.iter():
-                    ctag = child.tag.split('}')[-1] if '}' in child.tag else child.tag
-                    if ctag == addr_tag and child.text:
-                        agency['city'] = child.text.strip()
-                        break
-                if 'city' in agency:
-                    break
+def _usd(amount):
+    """Whole-dollar amount with thousands separators; cheaper than f"${x:,.0f}"."""
+    return "$" + format(round(amount), ",d")
 
-            for state_tag in ('StateAbbreviationCd', 'State'):
-                for child in entry.iter():
-                    ctag = child.tag.split('}')[-1] if '}' in child.tag else child.tag
-                    if ctag == state_tag and child.text:
-                        agency['state'] = child.text.strip()
-                        break
-                if 'state' in agency:
-                    break
 
-            if agency.get('name'):
-                agencies.append(agency)
+def evaluate_org(org, min_rev, max_rev, min_fund, min_agency):
+    """
+    Run the revenue / fundraising / Schedule G checks for one search result.
+    Makes no Streamlit calls so it can run in a worker thread; returns
+    (details or None, in_revenue_range, log_lines) for the caller to render.
+    Qualifying details carry the parsed Part VII "officers" for Phase 2.
+    """
+    log = []
+    ein = org.get("ein")
+    name = org.get("name", "Unknown")
 
-        return agencies
-    except Exception:
-        return []
+    org_data = get_org_details(ein)
+    if not org_data:
+        return None, False, log
+
+    in_range, revenue, total_expenses = check_revenue(org_data, min_rev, max_rev)
+    if not in_range:
+        return None, False, log
+
+    log.append(f"Checking: **{name}** (EIN: {ein}) — Rev: {_usd(revenue)}")
+
+    # Cheap gate before the multi-MB XML download; above-threshold filers are still verified from XML
+    json_fund = get_json_fundraising(org_data)
+    if json_fund is not None and json_fund < min_fund:
+        log.append(f"  ❌ Fundraising expense {_usd(json_fund)} < {_usd(min_fund)} (filing data, XML skipped)")
+        return None, True, log
+
+    xml_url = get_xml_url(org_data)
+    if not xml_url:
+        log.append(f"  ❌ No XML e-file available")
+        return None, True, log
+
+    xml_blob = fetch_xml_compressed(xml_url)
+    if not xml_blob:
+        log.append(f"  ❌ Could not download XML e-file")
+        return None, True, log
+
+    parsed = parse_990_compressed(xml_blob)
+    fundraising_exp = parsed["fundraising"]
+    if fundraising_exp < min_fund:
+        log.append(f"  ❌ Fundraising expense {_usd(fundraising_exp)} < {_usd(min_fund)}")
+        return None, True, log
+
+    log.append(f"  ✅ Revenue: {_usd(revenue)} | Fundraising: {_usd(fundraising_exp)}")
+    log.append(f"  🔍 Parsing Schedule G for agencies...")
+
+    agencies = parsed["agencies"]
+
+    if not agencies:
+        log.append(f"  ❌ No Schedule G agency data found")
+        return None, True, log
+
+    qualifying_agencies = [a for a in agencies if a.get("amount_paid", 0) >= min_agency]
+
+    if not qualifying_agencies:
+        msg = f"  ❌ Agencies found but none >= {_usd(min_agency)}"
+        if LOG_VERBOSE:
+            msg += ": " + ", ".join(f"{a.get('name', '?')} ({_usd(a.get('amount_paid', 0))})" for a in agencies[:3])
+        log.append(msg)
+        return None, True, log
+
+    details = build_org_details(org_data, revenue, total_expenses, fundraising_exp, xml_url)
+    details["agencies"] = qualifying_agencies
+    details["officers"] = parsed["officers"]
+
+    if LOG_VERBOSE:
+        log.extend(f"  💰 Agency: **{a.get('name', 'Unknown')}** — Paid: {_usd(a.get('amount_paid', 0))}"
+                   for a in qualifying_agencies)
+
+    return details, True, log
 
 
 # ─── Officer/Contact Extraction ─────────────────────────────────────────────
-def extract_officers_from_xml(xml_content):
-    if not xml_content:
-        return []
-    try:
-        root = ET.fromstring(xml_content)
-        officers = []
-
-        found_entries = []
-        for elem in root.iter():
-            tag = elem.tag.split('}')[-1] if '}' in elem.tag else elem.tag
-            if tag in ('Form990PartVIISectionAGrp', 'OfficerDirectorTrusteeEmplGrp',
-                       'CompensationInfoGrp', 'Form990PartVIISectionA'):
-                found_entries.append(elem)
-
-        for entry in found_entries:
-            person = {}
-            for name_tag in ('PersonNm', 'PersonFullName', 'Name',
-                             'BusinessNameLine1Txt', 'BusinessNameLine1'):
-                for child in entry.iter():
-                    ctag = child.tag.split('}')[-1] if '}' in child.tag else child.tag
-                    if ctag == name_tag and child.text:
-                        person['name'] = child.text.strip()
-                        break
-                if 'name' in person:
-                    break
+MAX_CONTACTS = 4  # per charity, across Form 990 and Apollo.io
 
-            for title_tag in ('TitleTxt', 'Title', 'PersonTitleTxt'):
-                for child in entry.iter():
-                    ctag = child.tag.split('}')[-1] if '}' in child.tag else child.tag
-                    if ctag == title_tag and child.text:
-                        person['title'] = child.text.strip()
-                        break
-                if 'title' in person:
-                    break
+FUNDRAISING_KW = ['development', 'fundrais', 'advancement', 'donor', 'philanthrop',
+                  'annual giving', 'major gift', 'planned giving', 'campaign',
+                  'chief development', 'cdo', 'vp develop', 'vice president develop']
+LEADERSHIP_KW = ['chief', 'president', 'executive director', 'ceo', 'cfo', 'coo',
+                 'vp', 'vice president', 'svp', 'evp', 'director', 'secretary', 'treasurer']
 
-            for comp_tag in ('ReportableCompFromOrgAmt', 'ReportableCompFromOrg',
-                             'CompensationAmount', 'TotalCompensation'):
-                for child in entry.iter():
-                    ctag = child.tag.split('}')[-1] if '}' in child.tag else child.tag
-                    if ctag == comp_tag and child.text:
-                        try:
-                            person['compensation'] = float(child.text)
-                        except ValueError:
-                            pass
-                        break
-                if 'compensation' in person:
-                    break
 
-            for hours_tag in ('AverageHoursPerWeekRt', 'AverageHoursPerWeek',
-                              'AvgHoursPerWkDevotedToPosRt'):
-                for child in entry.iter():
-                    ctag = child.tag.split('}')[-1] if '}' in child.tag else child.tag
-                    if ctag == hours_tag and child.text:
-                        person['hours_per_week'] = child.text.strip()
-                        break
-                if 'hours_per_week' in person:
-                    break
+def _keyword_re(keywords):
+    # Stems ("fundrais", "develop") must start a word; acronyms ("coo", "vp") must be the whole
+    # word, so "Coordinator" no longer scores as COO. re.I spares lowercasing every title.
+    return re.compile('|'.join(rf"\b{re.escape(kw)}" + (r"\b" if len(kw) <= 3 else "")
+                               for kw in keywords), re.I)
 
-            if person.get('name'):
-                officers.append(person)
-        return officers
-    except Exception:
-        return []
 
+FUND_RE = _keyword_re(FUNDRAISING_KW)
+LEAD_RE = _keyword_re(LEADERSHIP_KW)
 
-def filter_fundraising_contacts(officers):
-    """Score and rank officers for fundraising/development relevance. Return top 4."""
-    fundraising_kw = ['development', 'fundrais', 'advancement', 'donor', 'philanthrop',
-                      'annual giving', 'major gift', 'planned giving', 'campaign',
-                      'chief development', 'cdo', 'vp develop', 'vice president develop']
-    leadership_kw = ['chief', 'president', 'executive director', 'ceo', 'cfo', 'coo',
-                     'vp', 'vice president', 'svp', 'evp', 'director', 'secretary', 'treasurer']
 
+@functools.lru_cache(maxsize=8192)
+def _title_score(title):
+    """Keyword part of the relevance score; depends only on the title."""
+    score = 0
+    if FUND_RE.search(title):
+        score += 10
+    if LEAD_RE.search(title):
+        score += 5
+    return score
+
+
+def filter_fundraising_contacts(officers):
+    """Score and rank officers for fundraising/development relevance. Return the top MAX_CONTACTS."""
     scored = []
     for officer in officers:
-        title = (officer.get('title', '') or '').lower()
-        score = 0
-        for kw in fundraising_kw:
-            if kw in title:
-                score += 10
-                break
-        for kw in leadership_kw:
-            if kw in title:
-                score += 5
-                break
+        score = _title_score(officer.get('title', '') or '')
         if officer.get('compensation', 0) and officer['compensation'] > 0:
             score += 3
         try:
@@ -380,19 +690,42 @@ def filter_fundraising_contacts(officers):
             scored.append(officer)
 
     scored.sort(key=lambda x: (x.get('relevance_score', 0), x.get('compensation', 0)), reverse=True)
-    return scored[:4]
+    return scored[:MAX_CONTACTS]
+
+
+def contacts_from_990(xml_url):
+    """Fetch, parse and rank one filing's Part VII officers. Safe to run in a worker thread."""
+    xml_blob = fetch_xml_compressed(xml_url) if xml_url else None
+    return filter_fundraising_contacts(parse_990_compressed(xml_blob)["officers"])
 
 
 # ─── Apollo.io Contact Enrichment ────────────────────────────────────────────
+APOLLO_WORKERS = 5
+# Apollo bills per lookup; reruns and repeat searches within a day reuse the answer
+APOLLO_TTL = 24 * 3600
+# One more than MAX_CONTACTS: Apollo's leadership titles often repeat Form 990
+# officers, and name dedup needs spares to still fill a charity up
+APOLLO_PER_PAGE = 5
+
 
 def apollo_search_contacts(org_name, apollo_key):
     """
     Search Apollo.io for people at an organization matching fundraising/development titles.
-    Returns list of contacts with name, title, email, LinkedIn, phone.
+    Returns up to APOLLO_PER_PAGE contacts with name, title, email, LinkedIn, phone.
     """
     if not apollo_key:
         return []
+    # Keyed on a digest so the raw key never becomes part of the cache key
+    key_hash = hashlib.sha256(apollo_key.encode()).hexdigest()
+    try:
+        return _apollo_search_cached(org_name, key_hash, apollo_key)
+    except Exception:
+        return []
+
 
+@st.cache_data(ttl=APOLLO_TTL, show_spinner=False)
+def _apollo_search_cached(org_name, key_hash, _apollo_key):
+    # Failures raise instead of returning [] so they are retried, not cached
     titles = [
         "VP Development", "Vice President Development",
         "Chief Development Officer", "CDO",
@@ -408,75 +741,117 @@ def apollo_search_contacts(org_name, apollo_key):
 
     contacts = []
 
-    try:
-        org_search_url = f"{APOLLO_API_URL}/mixed_people/search"
-        payload = {
-            "api_key": apollo_key,
-            "q_organization_name": org_name,
-            "person_titles": titles,
-            "page": 1,
-            "per_page": 5,
+    org_search_url = f"{APOLLO_API_URL}/mixed_people/search"
+    payload = {
+        "api_key": _apollo_key,
+        "q_organization_name": org_name,
+        "person_titles": titles,
+        "page": 1,
+        "per_page": APOLLO_PER_PAGE,
+    }
+
+    bucket = get_apollo_bucket()
+    for attempt in range(3):
+        bucket.acquire()
+        resp = get_http_session().post(org_search_url, json=payload, headers=headers, timeout=30)
+        if resp.status_code != 429:
+            break
+        pause = retry_delay(resp, attempt, 5)
+        bucket.slow_down(pause=pause or 0)
+        if pause is None:
+            break
+
+    resp.raise_for_status()
+    data = json_loads(resp.content)
+    people = data.get("people", [])
+
+    for person in people[:APOLLO_PER_PAGE]:
+        contact = {
+            "name": f"{person.get('first_name', '')} {person.get('last_name', '')}".strip(),
+            "title": person.get("title", ""),
+            "email": person.get("email", ""),
+            "linkedin_url": person.get("linkedin_url", ""),
+            "phone": "",
+            "compensation": 0,
+            "hours_per_week": "",
+            "relevance_score": 8,
+            "source": "Apollo.io",
         }
 
-        time.sleep(0.3)
-        resp = requests.post(org_search_url, json=payload, headers=headers, timeout=30)
-
-        if resp.status_code == 200:
-            data = resp.json()
-            people = data.get("people", [])
-
-            for person in people[:4]:
-                contact = {
-                    "name": f"{person.get('first_name', '')} {person.get('last_name', '')}".strip(),
-                    "title": person.get("title", ""),
-                    "email": person.get("email", ""),
-                    "linkedin_url": person.get("linkedin_url", ""),
-                    "phone": "",
-                    "compensation": 0,
-                    "hours_per_week": "",
-                    "relevance_score": 8,
-                    "source": "Apollo.io",
-                }
-
-                phone_numbers = person.get("phone_numbers", [])
-                if phone_numbers:
-                    contact["phone"] = phone_numbers[0].get("sanitized_number", "")
-
-                if contact["name"]:
-                    contacts.append(contact)
+        phone_numbers = person.get("phone_numbers", [])
+        if phone_numbers:
+            contact["phone"] = phone_numbers[0].get("sanitized_number", "")
 
-    except Exception:
-        pass
+        if contact["name"]:
+            contacts.append(contact)
 
     return contacts
 
 
+def apollo_search_contacts_bulk(org_names, apollo_key, on_result=None):
+    """
+    Run apollo_search_contacts for many organizations concurrently (still paced
+    by the Apollo bucket). Returns {org_name: [contacts]}. If given, on_result(name,
+    done, total) is called from the calling thread as each lookup finishes.
+    """
+    if not apollo_key or not org_names:
+        return {}
+    names = list(dict.fromkeys(org_names))
+    results = {}
+    with ThreadPoolExecutor(max_workers=APOLLO_WORKERS) as pool:
+        futures = {pool.submit(apollo_search_contacts, name, apollo_key): name for name in names}
+        for future in as_completed(futures):
+            name = futures[future]
+            results[name] = future.result()
+            if on_result:
+                on_result(name, len(results), len(names))
+    return results
+
+
 # ─── Excel Builder ───────────────────────────────────────────────────────────
-def build_excel(charities, all_contacts, params):
-    """Build formatted Excel workbook and return as bytes."""
-    wb = openpyxl.Workbook()
+def build_excel(charities, all_contacts, params, generated):
+    """Build formatted Excel workbook and return as bytes. `generated` is the timestamp shown on the Criteria sheet."""
+    # Write-only mode streams rows straight into the zip instead of keeping every cell in memory
+    wb = openpyxl.Workbook(write_only=True)
 
-    header_font = Font(bold=True, color="FFFFFF", size=11)
-    header_fill = PatternFill(start_color="2F5496", end_color="2F5496", fill_type="solid")
+    # Styles are registered once as named styles; each cell then takes a single
+    # style reference instead of four separate font/fill/border/alignment lookups
     thin_border = Border(left=Side(style='thin'), right=Side(style='thin'),
                          top=Side(style='thin'), bottom=Side(style='thin'))
-    currency_fmt = '$#,##0'
+    wb.add_named_style(NamedStyle(
+        name="header", font=Font(bold=True, color="FFFFFF", size=11),
+        fill=PatternFill(start_color="2F5496", end_color="2F5496", fill_type="solid"),
+        alignment=Alignment(horizontal='center', wrap_text=True), border=thin_border))
+    wb.add_named_style(NamedStyle(name="cell", border=thin_border))
+    wb.add_named_style(NamedStyle(name="currency", border=thin_border, number_format='$#,##0'))
+
+    def write_table(ws, headers, rows, widths, currency_cols):
+        # Column widths must be set before the first append in write-only mode
+        for col, w in enumerate(widths, 1):
+            ws.column_dimensions[get_column_letter(col)].width = w
+        styles = ["currency" if col in currency_cols else "cell" for col in range(1, len(headers) + 1)]
+        header = []
+        for h in headers:
+            c = WriteOnlyCell(ws, value=h)
+            c.style = "header"
+            header.append(c)
+        ws.append(header)
+        for vals in rows:
+            row = []
+            for v, style in zip(vals, styles):
+                c = WriteOnlyCell(ws, value=v)
+                c.style = style
+                row.append(c)
+            ws.append(row)
 
     # ── Sheet 1: Summary ──
-    ws = wb.active
-    ws.title = "Charity Summary"
     headers = ["EIN", "Organization Name", "City", "State", "NTEE Code",
                "Total Revenue", "Total Expenses", "Fundraising Expenses",
                "Tax Year", "Fiscal Year End", "# Agencies", "Top Agency",
                "Top Agency Spend", "# Contacts"]
-    for col, h in enumerate(headers, 1):
-        c = ws.cell(row=1, column=col, value=h)
-        c.font = header_font
-        c.fill = header_fill
-        c.alignment = Alignment(horizontal='center', wrap_text=True)
-        c.border = thin_border
-
-    for ri, ch in enumerate(charities, 2):
+    rows = []
+    col_widths = [len(h) for h in headers]
+    for ch in charities:
         agencies = ch.get("agencies", [])
         contacts = all_contacts.get(ch["ein"], [])
         top = agencies[0] if agencies else {}
@@ -484,67 +859,31 @@ def build_excel(charities, all_contacts, params):
                 ch["revenue"], ch["total_expenses"], ch["fundraising_expenses"],
                 ch["tax_year"], ch["fiscal_year_end"], len(agencies),
                 top.get("name", "N/A"), top.get("amount_paid", 0), len(contacts)]
-        for col, v in enumerate(vals, 1):
-            c = ws.cell(row=ri, column=col, value=v)
-            c.border = thin_border
-            if col in (6, 7, 8, 13):
-                c.number_format = currency_fmt
-
-    for col in range(1, len(headers) + 1):
-        mx = max(len(str(ws.cell(row=r, column=col).value or "")) for r in range(1, len(charities) + 2))
-        ws.column_dimensions[get_column_letter(col)].width = min(mx + 4, 35)
+        for col, v in enumerate(vals):
+            col_widths[col] = max(col_widths[col], len(str(v or "")))
+        rows.append(vals)
+    write_table(wb.create_sheet("Charity Summary"), headers, rows,
+                [min(w + 4, 35) for w in col_widths], (6, 7, 8, 13))
 
     # ── Sheet 2: Agencies ──
-    ws2 = wb.create_sheet("Fundraising Agencies")
     ah = ["EIN", "Organization", "Agency Name", "Agency City", "Agency State",
           "Amount Paid", "Amount Raised", "Activity"]
-    for col, h in enumerate(ah, 1):
-        c = ws2.cell(row=1, column=col, value=h)
-        c.font = header_font
-        c.fill = header_fill
-        c.alignment = Alignment(horizontal='center', wrap_text=True)
-        c.border = thin_border
-    ri = 2
-    for ch in charities:
-        for ag in ch.get("agencies", []):
-            vals = [ch["ein"], ch["name"], ag.get("name", ""), ag.get("city", ""),
-                    ag.get("state", ""), ag.get("amount_paid", 0),
-                    ag.get("amount_raised", 0), ag.get("activity", "")]
-            for col, v in enumerate(vals, 1):
-                c = ws2.cell(row=ri, column=col, value=v)
-                c.border = thin_border
-                if col in (6, 7):
-                    c.number_format = currency_fmt
-            ri += 1
-    for col in range(1, len(ah) + 1):
-        ws2.column_dimensions[get_column_letter(col)].width = 25
+    rows = [[ch["ein"], ch["name"], ag.get("name", ""), ag.get("city", ""),
+             ag.get("state", ""), ag.get("amount_paid", 0),
+             ag.get("amount_raised", 0), ag.get("activity", "")]
+            for ch in charities for ag in ch.get("agencies", [])]
+    write_table(wb.create_sheet("Fundraising Agencies"), ah, rows, [25] * len(ah), (6, 7))
 
     # ── Sheet 3: Contacts ──
-    ws3 = wb.create_sheet("Contacts")
     ch_h = ["EIN", "Organization", "Contact Name", "Title", "Compensation",
             "Hours/Week", "Relevance Score", "Email", "LinkedIn", "Phone", "Source"]
-    for col, h in enumerate(ch_h, 1):
-        c = ws3.cell(row=1, column=col, value=h)
-        c.font = header_font
-        c.fill = header_fill
-        c.alignment = Alignment(horizontal='center', wrap_text=True)
-        c.border = thin_border
-    ri = 2
-    for ch in charities:
-        for ct in all_contacts.get(ch["ein"], []):
-            vals = [ch["ein"], ch["name"], ct.get("name", ""), ct.get("title", ""),
-                    ct.get("compensation", 0), ct.get("hours_per_week", ""),
-                    ct.get("relevance_score", 0), ct.get("email", ""),
-                    ct.get("linkedin_url", ""), ct.get("phone", ""),
-                    ct.get("source", "Form 990")]
-            for col, v in enumerate(vals, 1):
-                c = ws3.cell(row=ri, column=col, value=v)
-                c.border = thin_border
-                if col == 5:
-                    c.number_format = currency_fmt
-            ri += 1
-    for col in range(1, len(ch_h) + 1):
-        ws3.column_dimensions[get_column_letter(col)].width = 22
+    rows = [[ch["ein"], ch["name"], ct.get("name", ""), ct.get("title", ""),
+             ct.get("compensation", 0), ct.get("hours_per_week", ""),
+             ct.get("relevance_score", 0), ct.get("email", ""),
+             ct.get("linkedin_url", ""), ct.get("phone", ""),
+             ct.get("source", "Form 990")]
+            for ch in charities for ct in all_contacts.get(ch["ein"], [])]
+    write_table(wb.create_sheet("Contacts"), ch_h, rows, [22] * len(ch_h), (5,))
 
     # ── Sheet 4: Criteria ──
     ws4 = wb.create_sheet("Criteria & Notes")
@@ -564,13 +903,16 @@ def build_excel(charities, all_contacts, params):
         ("", ""),
         ("Notes", ""),
         ("", "Contacts sourced from both Form 990 and Apollo.io where available"),
-        ("", f"Generated: {datetime.now().strftime('%Y-%m-%d %H:%M')}"),
+        ("", f"Generated: {generated.strftime('%Y-%m-%d %H:%M')}"),
     ]
-    for ri, (k, v) in enumerate(notes, 1):
-        ws4.cell(row=ri, column=1, value=k).font = Font(bold=True) if k else Font()
-        ws4.cell(row=ri, column=2, value=v)
     ws4.column_dimensions['A'].width = 30
     ws4.column_dimensions['B'].width = 60
+    bold = Font(bold=True)
+    for k, v in notes:
+        key = WriteOnlyCell(ws4, value=k)
+        if k:
+            key.font = bold
+        ws4.append([key, v])
 
     buf = io.BytesIO()
     wb.save(buf)
@@ -578,6 +920,16 @@ def build_excel(charities, all_contacts, params):
     return buf
 
 
+@st.cache_data(show_spinner=False, max_entries=8)
+def build_excel_cached(qualifying_json, contacts_json, params_tuple, generated):
+    """
+    build_excel keyed on serialized inputs, so reruns reuse the workbook bytes.
+    `generated` is part of the key, so the stamped time is never older than the download.
+    """
+    buf = build_excel(json_loads(qualifying_json), json_loads(contacts_json), dict(params_tuple), generated)
+    return buf.getvalue()
+
+
 # ═══════════════════════════════════════════════════════════════════════════════
 # STREAMLIT APP
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -627,6 +979,12 @@ if "qualifying" not in st.session_state:
     st.session_state.qualifying = []
 if "all_contacts" not in st.session_state:
     st.session_state.all_contacts = {}
+if "officers" not in st.session_state:
+    st.session_state.officers = {}
+if "qualifying_json" not in st.session_state:
+    st.session_state.qualifying_json = b""
+if "all_contacts_json" not in st.session_state:
+    st.session_state.all_contacts_json = b"{}"
 if "running" not in st.session_state:
     st.session_state.running = False
 if "phase" not in st.session_state:
@@ -642,24 +1000,54 @@ with col3:
     download_ready = len(st.session_state.qualifying) > 0
 
 # ─── Phase 1: Search ────────────────────────────────────────────────────────
+# Money stays numeric (sortable) and is only formatted for display
+_money = st.column_config.NumberColumn(format="dollar", step=1)
+MONEY_COLUMNS = {"Revenue": _money, "Fundraising $": _money, "Agency Spend": _money}
+RESULTS_REFRESH_EVERY = 5
+LOG_MAX_LINES = 50
+
 if start_search:
     st.session_state.qualifying = []
     st.session_state.all_contacts = {}
+    st.session_state.officers = {}
+    st.session_state.qualifying_json = b""
+    st.session_state.all_contacts_json = b"{}"
 
     qualifying = []
+    officers_by_ein = {}
     checked = 0
     revenue_match = 0
 
     progress_bar = st.progress(0, text="Starting search...")
     status = st.empty()
     results_area = st.empty()
-    log_area = st.expander("Detailed log", expanded=False)
-    log_lines = []
+    log_box = st.expander("Detailed log", expanded=False).empty()
+    log_lines = deque(maxlen=LOG_MAX_LINES)
 
     def add_log(msg):
         log_lines.append(f"`{datetime.now().strftime('%H:%M:%S')}` {msg}")
-        with log_area:
-            st.markdown("\n\n".join(log_lines[-50:]))
+
+    def flush_log():
+        # One widget update per batch of lines, replacing (not appending to) the log view
+        log_box.markdown("\n\n".join(log_lines))
+
+    # Results table kept column-wise and grown one row per hit, so a refresh hands
+    # st.dataframe ready-made columns instead of re-walking every charity dict
+    display_cols = {col: [] for col in ("Name", "State", "Revenue", "Fundraising $",
+                                        "Top Agency", "Agency Spend", "Tax Year")}
+
+    def add_display_row(q):
+        top_ag = q["agencies"][0] if q["agencies"] else {}
+        row = (q["name"], q["state"], q["revenue"], q["fundraising_expenses"],
+               top_ag.get("name", "N/A"), top_ag.get("amount_paid", 0), q["tax_year"])
+        for values, value in zip(display_cols.values(), row):
+            values.append(value)
+
+    def render_results():
+        with results_area.container():
+            st.subheader(f"Qualifying Charities ({len(qualifying)}/{target_count})")
+            st.dataframe(display_cols, use_container_width=True,
+                         column_config=MONEY_COLUMNS)
 
     seen_eins = set()
     api_errors = 0
@@ -675,6 +1063,9 @@ if start_search:
         if len(qualifying) >= target_count:
             break
 
+        fetched = 0
+        new_eins = 0
+
         for page in range(pages_per_keyword):
             if len(qualifying) >= target_count:
                 break
@@ -696,89 +1087,58 @@ if start_search:
                 add_log(f"Keyword \"{keyword}\" page {page}: No more results.")
                 break
 
+            batch = []
             for org in orgs:
-                if len(qualifying) >= target_count:
-                    break
-
                 ein = org.get("ein")
                 if ein in seen_eins:
                     continue
                 seen_eins.add(ein)
+                batch.append(org)
+            fetched += len(orgs)
+            new_eins += len(batch)
+
+            status.info(f"Checking {len(batch)} organizations from \"{keyword}\" page {page}...")
+
+            with ThreadPoolExecutor(max_workers=SEARCH_WORKERS) as pool:
+                futures = [pool.submit(evaluate_org, org, min_rev, max_rev, min_fund, min_agency)
+                           for org in batch]
+                for future in futures:
+                    if len(qualifying) >= target_count:
+                        pool.shutdown(wait=False, cancel_futures=True)
+                        break
 
-                name = org.get("name", "Unknown")
-                checked += 1
-                status.info(f"[{checked}] Checking: {name}...")
-
-                org_data = get_org_details(ein)
-                if not org_data:
-                    continue
-
-                in_range, revenue, total_expenses = check_revenue(org_data, min_rev, max_rev)
-                if not in_range:
-                    continue
-
-                revenue_match += 1
-                add_log(f"Checking: **{name}** (EIN: {ein}) — Rev: ${revenue:,.0f}")
-
-                xml_url = get_xml_url(org_data)
-                if not xml_url:
-                    add_log(f"  ❌ No XML e-file available")
-                    continue
-
-                xml_content = fetch_xml(xml_url)
-                if not xml_content:
-                    add_log(f"  ❌ Could not download XML e-file")
-                    continue
-
-                fundraising_exp = get_fundraising_expense_from_xml(xml_content)
-                if fundraising_exp < min_fund:
-                    add_log(f"  ❌ Fundraising expense ${fundraising_exp:,.0f} < ${min_fund:,.0f}")
-                    continue
-
-                add_log(f"  ✅ Revenue: ${revenue:,.0f} | Fundraising: ${fundraising_exp:,.0f}")
-                add_log(f"  🔍 Parsing Schedule G for agencies...")
-
-                agencies = parse_schedule_g_from_content(xml_content)
-
-                if not agencies:
-                    add_log(f"  ❌ No Schedule G agency data found")
-                    continue
-
-                qualifying_agencies = [a for a in agencies if a.get("amount_paid", 0) >= min_agency]
-
-                if not qualifying_agencies:
-                    agency_summary = ", ".join(f"{a.get('name','?')} (${a.get('amount_paid',0):,.0f})" for a in agencies[:3])
-                    add_log(f"  ❌ Agencies found but none >= ${min_agency:,.0f}: {agency_summary}")
-                    continue
+                    details, in_range, log = future.result()
+                    checked += 1
+                    if in_range:
+                        revenue_match += 1
+                    for line in log:
+                        add_log(line)
+                    if details:
+                        officers_by_ein[details["ein"]] = details.pop("officers")
+                        qualifying.append(details)
+                        add_display_row(details)
+                        add_log(f"  🎯 **QUALIFIED #{len(qualifying)}: {details['name']}**")
+
+                        # Re-sending the whole table per hit is O(N^2); refresh in steps instead
+                        if len(qualifying) % RESULTS_REFRESH_EVERY == 0 or len(qualifying) >= target_count:
+                            render_results()
+                    if log:
+                        flush_log()
+
+            if fetched >= NOVELTY_MIN_FETCHED and new_eins / fetched < NOVELTY_MIN_RATIO:
+                add_log(f"Keyword \"{keyword}\": low novelty ({new_eins}/{fetched} new), advancing to next keyword.")
+                break
 
-                details = build_org_details(org_data, revenue, total_expenses, fundraising_exp, xml_url)
-                details["agencies"] = qualifying_agencies
-
-                for a in qualifying_agencies:
-                    add_log(f"  💰 Agency: **{a.get('name', 'Unknown')}** — Paid: ${a.get('amount_paid', 0):,.0f}")
-
-                qualifying.append(details)
-                add_log(f"  🎯 **QUALIFIED #{len(qualifying)}: {name}**")
-
-                with results_area.container():
-                    st.subheader(f"Qualifying Charities ({len(qualifying)}/{target_count})")
-                    display_data = []
-                    for q in qualifying:
-                        top_ag = q["agencies"][0] if q["agencies"] else {}
-                        display_data.append({
-                            "Name": q["name"],
-                            "State": q["state"],
-                            "Revenue": f"${q['revenue']:,.0f}",
-                            "Fundraising $": f"${q['fundraising_expenses']:,.0f}",
-                            "Top Agency": top_ag.get("name", "N/A"),
-                            "Agency Spend": f"${top_ag.get('amount_paid', 0):,.0f}",
-                            "Tax Year": q["tax_year"],
-                        })
-                    st.dataframe(display_data, use_container_width=True)
+        flush_log()
 
+    if qualifying:
+        render_results()
     progress_bar.progress(1.0, text=f"Done! Found {len(qualifying)} qualifying charities from {checked} checked.")
     status.success(f"Search complete. {len(qualifying)} charities qualified out of {checked} checked ({revenue_match} in revenue range).")
     st.session_state.qualifying = qualifying
+    st.session_state.officers = officers_by_ein
+    # Serialized once per result set rather than on every rerun
+    st.session_state.qualifying_json = json_dumps(qualifying)
 
 # ─── Phase 2: Contacts ──────────────────────────────────────────────────────
 if get_contacts and st.session_state.qualifying:
@@ -788,34 +1148,51 @@ if get_contacts and st.session_state.qualifying:
     progress = st.progress(0, text="Extracting contacts...")
     contact_status = st.empty()
 
+    # Source 1: Form 990 Part VII officers, as kept from the search; any charity
+    # whose officers weren't kept has its filing fetched and parsed concurrently
+    contact_status.info(f"Ranking Form 990 officers for {len(charities)} charities...")
+    with ThreadPoolExecutor(max_workers=SEARCH_WORKERS) as pool:
+        form990_futures = {ch["ein"]: pool.submit(contacts_from_990, ch["xml_url"]) for ch in charities
+                           if ch["ein"] not in st.session_state.officers and ch.get("xml_url")}
+        form990_by_ein = {ch["ein"]: filter_fundraising_contacts(st.session_state.officers[ch["ein"]])
+                          for ch in charities if ch["ein"] in st.session_state.officers}
+        form990_by_ein.update((ein, f.result()) for ein, f in form990_futures.items())
+
+    # Source 2: Apollo.io, only for charities the 990 left short of MAX_CONTACTS
+    apollo_results = {}
+    if use_apollo:
+        apollo_needed = [ch["name"] for ch in charities
+                         if len(form990_by_ein.get(ch["ein"], [])) < MAX_CONTACTS]
+
+        def show_apollo_progress(name, done, total):
+            progress.progress(done / total, text=f"Apollo.io lookups: {done}/{total}")
+            contact_status.info(f"[{done}/{total}] Apollo.io lookup done for {name}")
+
+        if apollo_needed:
+            contact_status.info(f"Apollo.io lookup for {len(apollo_needed)} of {len(charities)} charities...")
+            apollo_results = apollo_search_contacts_bulk(apollo_needed, apollo_key,
+                                                         on_result=show_apollo_progress)
+
     for i, ch in enumerate(charities):
         progress.progress((i + 1) / len(charities), text=f"Getting contacts for {ch['name']}...")
-        contact_status.info(f"[{i+1}/{len(charities)}] Parsing Form 990 for {ch['name']}...")
-
-        contacts = []
-
-        # Source 1: Form 990 Part VII officers
-        xml_url = ch.get("xml_url", "")
-        xml_content = fetch_xml(xml_url) if xml_url else None
-        officers = extract_officers_from_xml(xml_content)
-        filtered_990 = filter_fundraising_contacts(officers)
-        contacts.extend(filtered_990)
-
-        # Source 2: Apollo.io enrichment (if key provided)
-        if use_apollo:
-            contact_status.info(f"[{i+1}/{len(charities)}] Apollo.io lookup for {ch['name']}...")
-            apollo_contacts = apollo_search_contacts(ch["name"], apollo_key)
-            for ac in apollo_contacts:
-                # Avoid duplicates by name
-                existing_names = {c.get("name", "").lower() for c in contacts}
-                if ac.get("name", "").lower() not in existing_names:
-                    contacts.append(ac)
-
-        # Keep top 4
-        contacts = contacts[:4]
+        contact_status.info(f"[{i+1}/{len(charities)}] Merging contacts for {ch['name']}...")
+
+        contacts = list(form990_by_ein.get(ch["ein"], []))
+
+        # Fill up from Apollo.io, avoiding duplicates by name
+        existing_names = {c.get("name", "").lower() for c in contacts}
+        for ac in apollo_results.get(ch["name"], []):
+            if len(contacts) >= MAX_CONTACTS:
+                break
+            n = ac.get("name", "").lower()
+            if n and n not in existing_names:
+                contacts.append(ac)
+                existing_names.add(n)
+
         all_contacts[ch["ein"]] = contacts
 
     st.session_state.all_contacts = all_contacts
+    st.session_state.all_contacts_json = json_dumps(all_contacts)
     total = sum(len(c) for c in all_contacts.values())
     progress.progress(1.0, text=f"Done! Found {total} contacts across {len(charities)} charities.")
     contact_status.success(f"Extracted {total} contacts.")
@@ -844,20 +1221,25 @@ if st.session_state.qualifying:
     st.divider()
     st.subheader("📥 Download Results")
 
-    excel_buf = build_excel(st.session_state.qualifying, st.session_state.all_contacts, params)
+    if not st.session_state.qualifying_json:
+        st.session_state.qualifying_json = json_dumps(st.session_state.qualifying)
+    # Minute resolution, matching what the workbook and filename show; reruns within it reuse the bytes
+    generated = datetime.now().replace(second=0, microsecond=0)
+    excel_bytes = build_excel_cached(st.session_state.qualifying_json,
+                                     st.session_state.all_contacts_json,
+                                     tuple(sorted(params.items())), generated)
     st.download_button(
         label="Download Excel Spreadsheet",
-        data=excel_buf,
-        file_name=f"charity_prospector_{datetime.now().strftime('%Y%m%d_%H%M')}.xlsx",
+        data=excel_bytes,
+        file_name=f"charity_prospector_{generated.strftime('%Y%m%d_%H%M')}.xlsx",
         mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
         type="primary",
     )
 
     # Also show JSON download
-    json_str = json.dumps(st.session_state.qualifying, indent=2)
     st.download_button(
         label="Download Raw JSON Data",
-        data=json_str,
+        data=st.session_state.qualifying_json,
         file_name="qualifying_charities.json",
         mime="application/json",
     )
@@ -884,5 +1266,5 @@ with st.expander("ℹ️ How this works"):
 **Limitations:**
 - The search API doesn't support filtering by revenue directly, so we check each org individually
 - Schedule G data is only available for e-filed returns (most large orgs e-file)
-- API rate limiting: ~0.5-1.5s between requests to be respectful of the free service
+- API rate limiting: ProPublica requests are capped at ~2/second (halved after a 429) to be respectful of the free service
     """)